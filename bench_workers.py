@@ -0,0 +1,148 @@
+"""Benchmark - throughput scaling of multi-core mode.
+
+Usage:
+    python bench_workers.py [updates] [max_workers] [--latency SECONDS]
+
+Runs the real multi-core worker path for N = 1, 2, 4, ... up to max_workers
+(default: CPU count) and reports updates/s. The front pickles pyrogram
+/start deep-link Messages and routes them with multicore.worker_for; each
+worker process imports main.py in worker mode against a shared temporary WAL
+database, binds the simulator's FakeClient as `bot` and feeds every update
+through multicore.dispatch into the registered handlers (user registration,
+ban check, catalog lookup, delivery, scheduled deletion rows).
+
+With the default --latency 0 Telegram API calls cost nothing, so the numbers
+are the CPU/SQLite ceiling that worker count can lift. "delivered" counts the
+files whose deletion was scheduled, i.e. handlers that ran to completion.
+"""
+import argparse, asyncio, multiprocessing, os, pickle, random, sqlite3, tempfile, time
+import bot_logging, multicore, simulator
+from multicore import worker_for
+
+CHUNK = 100  # Updates per queue put
+CHANNELS = [-1000000000001, -1000000000002]
+
+# ------------------ WORKER PROCESS ------------------
+
+async def serve(client, slots, updates, done):
+    """multicore.serve_worker without the Telegram connection and leader duties"""
+    await asyncio.sleep(0)  # let the handler registrations queued at import run
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(slots)
+    running = set()
+    handled = 0
+    done.put("ready")
+    while True:
+        chunk = await loop.run_in_executor(None, updates.get)
+        if chunk is None:
+            break
+        for data in chunk:
+            update = pickle.loads(data)
+            update.bind(client)
+            await slots.acquire()
+            task = asyncio.create_task(multicore.dispatch(client, update))
+            running.add(task)
+            task.add_done_callback(lambda t: (running.discard(t), slots.release()))
+            handled += 1
+    await asyncio.gather(*running)
+    return handled
+
+def bench_worker(worker_id, db_file, latency, updates, log_records, done):
+    # Same setup as multicore.worker_main, with the fake client instead of a Telegram session
+    os.environ["FILESTORE_WORKER"] = str(worker_id)
+    simulator.sandbox_config(db_file, CHANNELS)
+    bot_logging.setup_worker_logging(log_records)
+    import main
+    client = simulator.FakeClient(latency, chat_rate=0, channels=CHANNELS)
+    client.dispatcher = main.bot.dispatcher
+    slots = main.bot.workers
+    main.bot = client
+    # Handlers were registered on the real client's loop at import time
+    done.put(asyncio.get_event_loop().run_until_complete(serve(client, slots, updates, done)))
+
+# ------------------ FRONT PROCESS ------------------
+
+def make_template(workdir, files):
+    """Schema from main.py plus a seeded catalog, copied fresh for every run"""
+    simulator.sandbox_config(os.path.join(workdir, "template.db"), CHANNELS)
+    import main
+    simulator.seed_database(main, files, 0, 1, CHANNELS)
+    return main.conn
+
+def make_updates(count, users, files):
+    """Pickled /start deep-link Messages, as the front process would route them"""
+    from pyrogram.enums import ChatType, MessageEntityType
+    from pyrogram.types import Chat, Message, MessageEntity, User
+    import main
+    updates = []
+    for _ in range(count):
+        user_id = random.randint(1, users)
+        user = User(id=user_id, first_name=f"User{user_id}", username=f"user{user_id}", is_bot=False, language_code="en")
+        text = f"/start {main.encode_payload(f'file_{random.randint(1, files)}')}"
+        message = Message(
+            id=random.randint(1, 10 ** 6), from_user=user, text=text,
+            chat=Chat(id=user_id, type=ChatType.PRIVATE, first_name=user.first_name),
+            entities=[MessageEntity(type=MessageEntityType.BOT_COMMAND, offset=0, length=6)],
+        )
+        updates.append((user_id, pickle.dumps(message)))
+    return updates
+
+def run(workers, updates, db_file, latency, log_records):
+    ctx = multiprocessing.get_context("spawn")
+    queues = [ctx.Queue() for _ in range(workers)]
+    done = ctx.Queue()
+    processes = [ctx.Process(target=bench_worker, args=(i, db_file, latency, queues[i], log_records, done))
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        done.get()
+
+    started = time.perf_counter()
+    pending = [[] for _ in range(workers)]
+    for user_id, data in updates:
+        target = worker_for(user_id, workers)
+        pending[target].append(data)
+        if len(pending[target]) == CHUNK:
+            queues[target].put(pending[target])
+            pending[target] = []
+    for i, chunk in enumerate(pending):
+        if chunk:
+            queues[i].put(chunk)
+        queues[i].put(None)
+    handled = sum(done.get() for _ in processes)
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join()
+    return handled, elapsed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure multi-core mode throughput against a fake Telegram client")
+    parser.add_argument("updates", type=int, nargs="?", default=20000)
+    parser.add_argument("max_workers", type=int, nargs="?", default=os.cpu_count() or 1)
+    parser.add_argument("--latency", type=float, default=0, help="Mean API latency in seconds")
+    args = parser.parse_args()
+    random.seed(1)
+
+    with tempfile.TemporaryDirectory(prefix="filestore-bench-") as workdir:
+        log_records = multiprocessing.get_context("spawn").Queue()
+        listener = bot_logging.setup_logging(os.path.join(workdir, "bot.log"), console=False, records=log_records)
+        template = make_template(workdir, 5000)
+        updates = make_updates(args.updates, users=args.updates // 5, files=5000)
+
+        print(f"Multi-core scaling: {args.updates} deep-link updates, {os.cpu_count()} CPUs, latency {args.latency}s")
+        print(f"{'workers':>7} {'seconds':>9} {'updates/s':>10} {'speedup':>8} {'delivered':>10}")
+        baseline = None
+        workers = 1
+        while workers <= args.max_workers:
+            db_file = os.path.join(workdir, f"bench-{workers}.db")
+            with sqlite3.connect(db_file) as db:
+                template.backup(db)
+            handled, elapsed = run(workers, updates, db_file, args.latency, log_records)
+            with sqlite3.connect(db_file) as db:
+                delivered = db.execute("SELECT COUNT(*) FROM scheduled_deletions").fetchone()[0] // 3
+            rate = handled / elapsed
+            baseline = baseline or rate
+            print(f"{workers:>7} {elapsed:>9.2f} {rate:>10.0f} {rate / baseline:>7.2f}x {delivered:>10}")
+            workers *= 2
+        listener.stop()
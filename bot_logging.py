@@ -0,0 +1,150 @@
+import asyncio, json, logging, os, queue, threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from config import (
+    LOG_FILE, LOG_LEVEL, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_CHANNEL,
+    LOG_CHANNEL_LEVEL, LOG_DIGEST_INTERVAL, LOG_DIGEST_MAX_LINES
+)
+
+log = logging.getLogger("filestore")
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line for the rotating local log"""
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class TemplateQueueHandler(QueueHandler):
+    """QueueHandler that renders the message up front but keeps the template
+    (for digest aggregation) and exc_info (formatted later, off the hot path).
+
+    The record is modified in place: this is the only handler on a
+    non-propagating logger, so the copy the stock prepare() makes is wasted.
+    With `picklable` (worker processes) the traceback is rendered here,
+    since it cannot cross a multiprocessing queue.
+    """
+    def __init__(self, records, picklable=False):
+        super().__init__(records)
+        self.picklable = picklable
+
+    def prepare(self, record):
+        record.template = str(record.msg)
+        record.msg = record.getMessage()
+        record.args = None
+        if self.picklable and record.exc_info:
+            record.exc_type = record.exc_info[0].__name__
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class DigestHandler(logging.Handler):
+    """Collects records for the LOG_CHANNEL digest.
+
+    Records sharing a level, logger and message template (and exception type)
+    collapse into one entry with a count, so an error repeated a thousand
+    times costs one line.
+    """
+    def __init__(self, level=logging.INFO):
+        super().__init__(level)
+        self.entries = {}  # key -> [level, first rendered message, count, template]
+        self.entries_lock = threading.Lock()
+        # Failures of the digest itself go to the other outputs only
+        self.addFilter(lambda record: not getattr(record, "skip_digest", False))
+
+    def emit(self, record):
+        exc_type = getattr(record, "exc_type", "")
+        if record.exc_info and record.exc_info[0]:
+            exc_type = record.exc_info[0].__name__
+        template = getattr(record, "template", str(record.msg))
+        suffix = f" [{exc_type}]" if exc_type else ""
+        key = (record.levelno, record.name, template, exc_type)
+        with self.entries_lock:
+            entry = self.entries.get(key)
+            if entry:
+                entry[2] += 1
+            else:
+                self.entries[key] = [record.levelno, record.getMessage() + suffix, 1, template + suffix]
+
+    def drain(self):
+        with self.entries_lock:
+            entries, self.entries = self.entries, {}
+        return list(entries.values())
+
+LEVEL_ICONS = {logging.DEBUG: "🔹", logging.INFO: "ℹ️", logging.WARNING: "⚠️", logging.ERROR: "❌", logging.CRITICAL: "🔥"}
+
+def format_digest(entries, max_lines=LOG_DIGEST_MAX_LINES):
+    """Errors first, then the most frequent activity; fits in one Telegram message"""
+    entries.sort(key=lambda e: (-e[0], -e[2]))
+    lines = []
+    for level, message, count, template in entries[:max_lines]:
+        # Repeats differ in their arguments, so show the template instead of the first instance
+        if count > 1:
+            message = template.replace("%s", "…") + f" ×{count}"
+        lines.append(f"{LEVEL_ICONS.get(level, '•')} {message[:300]}")
+    if len(entries) > max_lines:
+        lines.append(f"…and {len(entries) - max_lines} more")
+    return ("📝 **Activity Digest**\n\n" + "\n".join(lines))[:4096]
+
+digest_handler = None
+
+def setup_logging(log_file=LOG_FILE, console=True, records=None):
+    """Route all bot logging through a queue so handlers never block on I/O.
+
+    `records` is the queue to listen on (multi-core mode passes the one
+    workers log into). Returns the QueueListener; stop it on shutdown to flush.
+    """
+    global digest_handler
+    # None of the outputs use these, and looking them up is a large share of LogRecord creation
+    logging.logProcesses = logging.logMultiprocessing = logging.logThreads = False
+    targets = []
+    if log_file:
+        os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+        file_handler = RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+        file_handler.setFormatter(JsonFormatter())
+        targets.append(file_handler)
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        targets.append(console_handler)
+    if LOG_CHANNEL:
+        digest_handler = DigestHandler(LOG_CHANNEL_LEVEL)
+        targets.append(digest_handler)
+
+    picklable = records is not None
+    if records is None:
+        records = queue.SimpleQueue()
+    log.handlers = [TemplateQueueHandler(records, picklable)]
+    log.setLevel(LOG_LEVEL)
+    log.propagate = False
+    listener = QueueListener(records, *targets, respect_handler_level=True)
+    listener.start()
+    return listener
+
+def setup_worker_logging(records):
+    """Multi-core workers only enqueue; the front process owns every output"""
+    logging.logProcesses = logging.logMultiprocessing = logging.logThreads = False
+    log.handlers = [TemplateQueueHandler(records, picklable=True)]
+    log.setLevel(LOG_LEVEL)
+    log.propagate = False
+
+async def digest_loop(client):
+    """Send at most one aggregated digest to LOG_CHANNEL every LOG_DIGEST_INTERVAL seconds"""
+    while True:
+        await asyncio.sleep(LOG_DIGEST_INTERVAL)
+        entries = digest_handler.drain() if digest_handler else []
+        if not entries:
+            continue
+        try:
+            await client.send_message(LOG_CHANNEL, format_digest(entries))
+        except Exception as e:
+            # Don't feed the failure back into the digest
+            log.warning("Failed to send log digest: %s", e, extra={"skip_digest": True})
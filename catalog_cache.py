@@ -0,0 +1,136 @@
+import sys, time
+from collections import OrderedDict
+from config import CATALOG_CACHE_FILES, CATALOG_CACHE_BATCHES, CATALOG_CACHE_RECHECK
+
+class FileRecord:
+    """A files row as send_file needs it"""
+    __slots__ = ("chat_id", "message_id", "file_name", "file_type", "locations")
+
+    def __init__(self, chat_id, message_id, file_name, file_type, locations):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.file_name = file_name
+        self.file_type = file_type
+        self.locations = locations  # tuple of (chat_id, message_id), primary first
+
+class BatchRecord:
+    """A batches row plus its resolved delivery plan"""
+    __slots__ = ("batch_name", "start", "end", "chat_id", "plan")
+
+    def __init__(self, batch_name, start, end, chat_id, plan):
+        self.batch_name = batch_name
+        self.start = start
+        self.end = end
+        self.chat_id = chat_id
+        self.plan = plan  # tuple with the replica locations of every message in start..end
+
+def _deep_size(obj):
+    """Approximate bytes held by a record (slots, strings, nested tuples)"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, tuple):
+        return size + sum(_deep_size(item) for item in obj)
+    for name in getattr(type(obj), "__slots__", ()):
+        size += _deep_size(getattr(obj, name))
+    return size
+
+class LRUCache:
+    """Bounded least-recently-used cache with hit/miss counters"""
+    # Approximate per-entry cost of the OrderedDict link and key
+    ENTRY_OVERHEAD = 100
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        record = self.entries.get(key)
+        if record is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return record
+
+    def put(self, key, record):
+        if self.capacity <= 0:
+            return
+        self.entries[key] = record
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def memory_bytes(self):
+        return sum(_deep_size(record) + self.ENTRY_OVERHEAD for record in self.entries.values())
+
+files = LRUCache(CATALOG_CACHE_FILES)
+batches = LRUCache(CATALOG_CACHE_BATCHES)
+
+def invalidate_file(file_id, chat_id=None, message_id=None):
+    """Drop a file and any cached batch plan whose range covers its location"""
+    files.invalidate(file_id)
+    if chat_id is None:
+        return
+    for batch_id, record in list(batches.entries.items()):
+        if record.chat_id == chat_id and record.start <= message_id <= record.end:
+            batches.invalidate(batch_id)
+
+def invalidate_batch(batch_id):
+    batches.invalidate(batch_id)
+
+# bot_settings row bumped by triggers on every files/batches insert, update
+# and delete, so caches are only dropped when the catalog itself changed
+VERSION_KEY = "catalog_version"
+
+_version = None
+_checked_at = 0.0
+
+def _read_version(conn):
+    row = conn.execute("SELECT setting_value FROM bot_settings WHERE setting_key = ?", (VERSION_KEY,)).fetchone()
+    return int(row[0]) if row else 0
+
+def catalog_triggers():
+    """CREATE TRIGGER statements that bump the version on any catalog write"""
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_catalog_version AFTER {event} ON {table} "
+        f"BEGIN UPDATE bot_settings SET setting_value = CAST(setting_value AS INTEGER) + 1 "
+        f"WHERE setting_key = '{VERSION_KEY}'; END"
+        for table in ("files", "batches") for event in ("INSERT", "UPDATE", "DELETE")
+    ]
+
+def check_external_writes(conn):
+    """Clear both caches when files or batches changed since the last check,
+    from any connection: another worker, a manual edit, or this process's own
+    uploads (rare next to lookups). The version row is read at most every
+    CATALOG_CACHE_RECHECK seconds."""
+    global _version, _checked_at
+    now = time.monotonic()
+    if now - _checked_at < CATALOG_CACHE_RECHECK:
+        return
+    _checked_at = now
+    version = _read_version(conn)
+    if _version is not None and version != _version:
+        files.clear()
+        batches.clear()
+    _version = version
+
+def format_stats():
+    lines = []
+    for name, cache in (("Files", files), ("Batches", batches)):
+        lines.append(
+            f"• {name}: {len(cache.entries)}/{cache.capacity}, "
+            f"hit {cache.hit_ratio() * 100:.1f}% ({cache.hits}/{cache.hits + cache.misses}), "
+            f"{cache.evictions} evicted, ~{cache.memory_bytes() / 1024:.0f} KB"
+        )
+    return "\n".join(lines)
@@ -13,6 +13,10 @@ DATABASE_NAME = "FileStoreDB"
 DB_CHANNEL = -1003068444789      # Your private database channel
 ADMINS = [1500034181]            # List of admin user IDs
 
+# Storage Channels
+STORAGE_CHANNELS = [DB_CHANNEL]  # Uploads are striped across these channels (bot must be admin in all)
+STORAGE_REPLICAS = 1             # Copies kept of every upload, each in a different channel (1 = no replication)
+
 # Bot Settings
 BOT_NAME = "Professional File Store Bot"
 BOT_VERSION = "2.0"
@@ -29,14 +33,55 @@ ALLOWED_FILE_TYPES = [
 MAX_BATCH_SIZE = 1000  # Maximum files per batch
 BATCH_DELAY = 0.5      # Delay between file sends (seconds)
 
+# User Management
+USERS_PAGE_SIZE = 15           # Users shown per page in the admin user browser
+BULK_CHUNK_SIZE = 1000         # Rows per transaction for bulk ban/unban
+MAX_ID_LIST_SIZE = 20 * 1024 * 1024  # Largest ID list file accepted for bulk ban/unban
+
 # Advanced Settings
 AUTO_DELETE_AFTER_DAYS = 0.1    # 0 means never delete, set number of days for auto-deletion
 LOG_CHANNEL = None            # Optional: Channel to log bot activities
+LOG_CHANNEL_LEVEL = "INFO"    # Lowest level included in LOG_CHANNEL digests
+LOG_DIGEST_INTERVAL = 60      # Seconds between LOG_CHANNEL digests (at most one message each)
+LOG_DIGEST_MAX_LINES = 40     # Distinct entries per digest
+LOG_LEVEL = "INFO"
+LOG_FILE = "logs/bot.log"     # Rotating JSON log, one object per line
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
 FORCE_SUB_CHANNEL = None      # Optional: Channel users must join before accessing files
 
+# Catalog Cache (files/batches rows used by deep links)
+CATALOG_CACHE_FILES = 10000     # Max cached files rows
+CATALOG_CACHE_BATCHES = 200     # Max cached batches, each with its delivery plan
+CATALOG_CACHE_RECHECK = 1.0     # Seconds between checks for writes by other processes
+
+# Multi-core Mode (python multicore.py)
+WORKERS = 4                                 # Worker processes; updates are routed by user_id
+LEADER_LOCK_FILE = "filestore.leader.lock"  # flock held by the worker running singleton duties
+LEADER_RETRY_INTERVAL = 5                   # Seconds between leadership attempts
+DELETION_POLL_INTERVAL = 5                  # Seconds between scheduled-deletion sweeps
+MAINTENANCE_REQUEST_INTERVAL = 5            # Seconds between checks for /dbstatus runs queued by other workers
+
 # Database File
 DB_FILE = "files.db"
 
+# Database Maintenance (intervals in seconds)
+DB_CHECKPOINT_INTERVAL = 15 * 60        # PRAGMA wal_checkpoint(PASSIVE)
+DB_VACUUM_INTERVAL = 6 * 60 * 60        # PRAGMA incremental_vacuum
+DB_VACUUM_PAGES = 500                   # Max free pages released per vacuum run
+DB_ANALYZE_INTERVAL = 24 * 60 * 60      # PRAGMA optimize / ANALYZE
+DB_BACKUP_INTERVAL = 24 * 60 * 60       # Online backup via sqlite3 backup API
+DB_BACKUP_DIR = "backups"
+DB_BACKUP_KEEP = 7                      # Number of backup files to keep
+DB_BACKUP_PAGES_PER_STEP = 256          # Pages copied per backup step
+DB_BACKUP_STEP_SLEEP = 0.05             # Pause between backup steps (seconds)
+
+# Profiling (/profile command)
+PROFILE_SAMPLE_INTERVAL = 0.005   # Seconds between thread stack samples
+PROFILE_TASK_INTERVAL = 0.1       # Seconds between asyncio task / loop-lag samples
+PROFILE_MAX_SECONDS = 300         # Longest profile window an admin can request
+PROFILE_TOP_N = 25                # Hotspots listed in the summary
+
 # Welcome Messages
 USER_WELCOME_TEXT = """
 👋 **Welcome {name}!**
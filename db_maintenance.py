@@ -0,0 +1,180 @@
+import sqlite3, asyncio, logging, os, time
+from datetime import datetime
+from config import (
+    DB_FILE, DB_CHECKPOINT_INTERVAL, DB_VACUUM_INTERVAL, DB_VACUUM_PAGES,
+    DB_ANALYZE_INTERVAL, DB_BACKUP_INTERVAL, DB_BACKUP_DIR, DB_BACKUP_KEEP,
+    DB_BACKUP_PAGES_PER_STEP, DB_BACKUP_STEP_SLEEP, MAINTENANCE_REQUEST_INTERVAL
+)
+
+log = logging.getLogger("filestore.maintenance")
+
+# Whether this process runs maintenance. Always true for a single process;
+# multicore.py clears it in workers until they hold the leader lock.
+leader = True
+
+def _connect():
+    """Open a dedicated connection so maintenance never shares the bot's cursor"""
+    return sqlite3.connect(DB_FILE, timeout=30)
+
+def migrate_auto_vacuum():
+    """Switch an existing database to incremental auto-vacuum, which needs one full VACUUM.
+
+    Runs once per start before the bot opens the database; multi-core mode
+    does it in the front process so workers never VACUUM concurrently.
+    """
+    db = _connect()
+    try:
+        if db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            db.execute("VACUUM")
+    finally:
+        db.close()
+
+def wal_checkpoint():
+    """Copy WAL frames back into the database without blocking readers or writers"""
+    db = _connect()
+    try:
+        busy, log_frames, checkpointed = db.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+    finally:
+        db.close()
+    return f"{checkpointed}/{log_frames} frames" + (" (busy)" if busy else "")
+
+def incremental_vacuum():
+    """Release up to DB_VACUUM_PAGES free pages back to the filesystem"""
+    db = _connect()
+    try:
+        before = db.execute("PRAGMA freelist_count").fetchone()[0]
+        # execute() steps the pragma once, which frees a single page; executescript runs it to completion
+        db.executescript(f"PRAGMA incremental_vacuum({int(DB_VACUUM_PAGES)});")
+        after = db.execute("PRAGMA freelist_count").fetchone()[0]
+    finally:
+        db.close()
+    return f"{before - after} pages freed, {after} left"
+
+def analyze():
+    """Refresh planner statistics with a bounded ANALYZE"""
+    db = _connect()
+    try:
+        db.execute("PRAGMA analysis_limit = 1000")
+        db.execute("ANALYZE")
+        db.execute("PRAGMA optimize")
+        db.commit()
+    finally:
+        db.close()
+    return "statistics refreshed"
+
+def backup():
+    """Take an online backup in page-limited steps, keeping the newest DB_BACKUP_KEEP files"""
+    os.makedirs(DB_BACKUP_DIR, exist_ok=True)
+    name = f"files-{datetime.now().strftime('%Y%m%d-%H%M%S')}.db"
+    target = os.path.join(DB_BACKUP_DIR, name)
+    partial = target + ".part"
+
+    src = _connect()
+    dst = sqlite3.connect(partial)
+    try:
+        src.backup(dst, pages=DB_BACKUP_PAGES_PER_STEP, sleep=DB_BACKUP_STEP_SLEEP)
+    finally:
+        dst.close()
+        src.close()
+    os.replace(partial, target)
+
+    backups = sorted(f for f in os.listdir(DB_BACKUP_DIR) if f.startswith("files-") and f.endswith(".db"))
+    for old in backups[:-DB_BACKUP_KEEP]:
+        os.remove(os.path.join(DB_BACKUP_DIR, old))
+    return name
+
+# name -> (function, interval in seconds)
+TASKS = {
+    "checkpoint": (wal_checkpoint, DB_CHECKPOINT_INTERVAL),
+    "vacuum": (incremental_vacuum, DB_VACUUM_INTERVAL),
+    "analyze": (analyze, DB_ANALYZE_INTERVAL),
+    "backup": (backup, DB_BACKUP_INTERVAL),
+}
+
+async def run_task(name):
+    """Run one maintenance task in a worker thread and record its timing"""
+    func, _ = TASKS[name]
+    started = time.monotonic()
+    result, error = None, None
+    try:
+        result = await asyncio.to_thread(func)
+    except Exception as e:
+        log.exception("Maintenance task %s failed", name)
+        error = str(e)
+    run = (name, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), time.monotonic() - started, result, error)
+    await asyncio.to_thread(_record_run, run)
+    return run
+
+def _record_run(run):
+    """Store the run in maintenance_runs so every process can report it"""
+    db = _connect()
+    try:
+        db.execute("INSERT OR REPLACE INTO maintenance_runs (task, finished, duration, result, error) "
+                   "VALUES (?, ?, ?, ?, ?)", run)
+        db.commit()
+    finally:
+        db.close()
+
+def load_runs():
+    """{task: (finished, duration, result, error)} for every task that has run"""
+    db = _connect()
+    try:
+        rows = db.execute("SELECT task, finished, duration, result, error FROM maintenance_runs").fetchall()
+    finally:
+        db.close()
+    return {row[0]: row[1:] for row in rows}
+
+async def maintenance_loop(poll_seconds=60):
+    """Run every task whenever its interval has elapsed"""
+    next_run = {name: time.monotonic() + interval for name, (_, interval) in TASKS.items()}
+    while True:
+        await asyncio.sleep(poll_seconds)
+        now = time.monotonic()
+        for name, (_, interval) in TASKS.items():
+            if now >= next_run[name]:
+                await run_task(name)
+                next_run[name] = time.monotonic() + interval
+
+def request_task(name, chat_id):
+    """Queue a manual run for the leader; it reports to chat_id when done"""
+    db = _connect()
+    try:
+        db.execute("INSERT INTO maintenance_requests (task, chat_id) VALUES (?, ?)", (name, chat_id))
+        db.commit()
+    finally:
+        db.close()
+
+def _take_requests():
+    db = _connect()
+    try:
+        rows = db.execute("SELECT id, task, chat_id FROM maintenance_requests ORDER BY id").fetchall()
+        db.executemany("DELETE FROM maintenance_requests WHERE id = ?", [(row[0],) for row in rows])
+        db.commit()
+    finally:
+        db.close()
+    return rows
+
+async def request_loop(client, poll_seconds=MAINTENANCE_REQUEST_INTERVAL):
+    """Leader-only: run the tasks other workers queued and send the status to whoever asked"""
+    while True:
+        await asyncio.sleep(poll_seconds)
+        for _, name, chat_id in await asyncio.to_thread(_take_requests):
+            await run_task(name)
+            try:
+                await client.send_message(chat_id, format_status())
+            except Exception:
+                log.exception("Could not report maintenance task %s to %s", name, chat_id)
+
+def format_status():
+    """Human readable report of the last run of each task"""
+    lines = ["🗄️ **Database Maintenance**\n"]
+    runs = load_runs()
+    for name, (_, interval) in TASKS.items():
+        if name not in runs:
+            lines.append(f"• **{name}** (every {interval // 60} min): never run")
+            continue
+        finished, duration, result, error = runs[name]
+        status = f"❌ {error}" if error else f"✅ {result}"
+        lines.append(f"• **{name}** (every {interval // 60} min): {finished}, {duration:.2f}s — {status}")
+    return "\n".join(lines)
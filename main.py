@@ -1,17 +1,44 @@
-import sqlite3, base64
-from pyrogram import Client, filters
+import sqlite3, base64, io, re, logging, os, time
+from pyrogram import Client, filters, idle
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message
-from config import API_ID, API_HASH, BOT_TOKEN, DB_CHANNEL, ADMINS
+from pyrogram.errors import FloodWait, RPCError
+from config import (
+    API_ID, API_HASH, BOT_TOKEN, DB_CHANNEL, STORAGE_CHANNELS, ADMINS, DB_FILE,
+    USERS_PAGE_SIZE, BULK_CHUNK_SIZE, MAX_ID_LIST_SIZE, PROFILE_MAX_SECONDS, LOG_CHANNEL,
+    DELETION_POLL_INTERVAL
+)
 import asyncio
 from datetime import datetime
+import db_maintenance
+import storage
+import profiler
+import bot_logging
+import catalog_cache
+
+log = logging.getLogger("filestore")
+
+# Set by multicore.py: workers get updates from the front process, not from Telegram
+WORKER_ID = os.environ.get("FILESTORE_WORKER")
 
 # Bot setup
-bot = Client("FileStoreBot", api_id=API_ID, api_hash=API_HASH, bot_token=BOT_TOKEN)
+bot = Client(
+    "FileStoreBot" if WORKER_ID is None else f"FileStoreBot_worker{WORKER_ID}",
+    api_id=API_ID, api_hash=API_HASH, bot_token=BOT_TOKEN, no_updates=WORKER_ID is not None
+)
+
+# Incremental auto-vacuum lets maintenance release free pages without a full VACUUM.
+# In multi-core mode the front process migrates before starting the workers.
+if WORKER_ID is None:
+    db_maintenance.migrate_auto_vacuum()
 
 # SQLite setup
-conn = sqlite3.connect("files.db", check_same_thread=False)
+conn = sqlite3.connect(DB_FILE, check_same_thread=False, timeout=30)
 cursor = conn.cursor()
 
+# WAL keeps readers unblocked while maintenance and backups run
+cursor.execute("PRAGMA journal_mode = WAL")
+cursor.execute("PRAGMA synchronous = NORMAL")
+
 # Enhanced Tables
 cursor.execute("""CREATE TABLE IF NOT EXISTS files (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -21,7 +48,8 @@ cursor.execute("""CREATE TABLE IF NOT EXISTS files (
     file_type TEXT,
     file_size INTEGER,
     uploaded_by INTEGER,
-    upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    locations TEXT
 )""")
 
 cursor.execute("""CREATE TABLE IF NOT EXISTS batches (
@@ -30,7 +58,8 @@ cursor.execute("""CREATE TABLE IF NOT EXISTS batches (
     start_msg INTEGER,
     end_msg INTEGER,
     created_by INTEGER,
-    created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    chat_id INTEGER
 )""")
 
 cursor.execute("""CREATE TABLE IF NOT EXISTS users (
@@ -55,8 +84,49 @@ cursor.execute("""CREATE TABLE IF NOT EXISTS bot_settings (
     setting_value TEXT
 )""")
 
+# Columns added after the first release: every storage location of a file,
+# and the storage channel a batch range lives in (NULL = DB_CHANNEL)
+def add_column(table, column, definition):
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+add_column("files", "locations", "TEXT")
+add_column("batches", "chat_id", "INTEGER")
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_location ON files (chat_id, message_id)")
+# Keyset pagination over users filtered by ban status / join date
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_banned ON users (is_banned, user_id)")
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_join_date ON users (join_date)")
+
+# Pending auto-deletions in multi-core mode, swept by the leader worker
+cursor.execute("""CREATE TABLE IF NOT EXISTS scheduled_deletions (
+    chat_id INTEGER,
+    message_id INTEGER,
+    delete_at REAL
+)""")
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_scheduled_deletions_due ON scheduled_deletions (delete_at)")
+
+# Last run of each maintenance task, shared by every process
+cursor.execute("""CREATE TABLE IF NOT EXISTS maintenance_runs (
+    task TEXT PRIMARY KEY,
+    finished TIMESTAMP,
+    duration REAL,
+    result TEXT,
+    error TEXT
+)""")
+
+# /dbstatus <task> from a worker that isn't the leader, picked up by the leader
+cursor.execute("""CREATE TABLE IF NOT EXISTS maintenance_requests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task TEXT,
+    chat_id INTEGER
+)""")
+
 # Initialize default auto-delete time (10 minutes)
 cursor.execute("INSERT OR IGNORE INTO bot_settings (setting_key, setting_value) VALUES ('auto_delete_minutes', '10')")
+cursor.execute("INSERT OR IGNORE INTO bot_settings (setting_key, setting_value) VALUES (?, '0')", (catalog_cache.VERSION_KEY,))
+for trigger in catalog_cache.catalog_triggers():
+    cursor.execute(trigger)
 
 conn.commit()
 
@@ -149,7 +219,10 @@ def format_file_size(size_bytes):
 
 async def add_user(user_id, first_name, username):
     """Add user to database if not exists"""
-    cursor.execute("INSERT OR IGNORE INTO users (user_id, first_name, username) VALUES (?, ?, ?)", 
+    # Rows created by /ban before the user ever started the bot get their names now
+    cursor.execute("INSERT INTO users (user_id, first_name, username) VALUES (?, ?, ?) "
+                   "ON CONFLICT(user_id) DO UPDATE SET first_name = excluded.first_name, username = excluded.username "
+                   "WHERE users.first_name IS NULL", 
                    (user_id, first_name, username))
     conn.commit()
 
@@ -159,8 +232,65 @@ async def delete_messages_after_delay(chat_id, message_ids, delay_minutes):
     for msg_id in message_ids:
         try:
             await bot.delete_messages(chat_id, msg_id)
-        except:
-            pass
+        except Exception as e:
+            log.warning("Auto-delete of message %s in chat %s failed: %s", msg_id, chat_id, e)
+
+def schedule_deletion(chat_id, message_ids, delay_minutes):
+    """Delete messages after a delay.
+
+    A single process keeps a sleeping task; in multi-core mode the deletion is
+    stored so the leader worker performs it, whichever worker sent the files.
+    """
+    if WORKER_ID is None:
+        asyncio.create_task(delete_messages_after_delay(chat_id, message_ids, delay_minutes))
+        return
+    delete_at = time.time() + delay_minutes * 60
+    cursor.executemany("INSERT INTO scheduled_deletions (chat_id, message_id, delete_at) VALUES (?, ?, ?)",
+                       [(chat_id, msg_id, delete_at) for msg_id in message_ids])
+    conn.commit()
+
+async def deletion_loop():
+    """Leader-only: delete every stored message whose time has come"""
+    while True:
+        await asyncio.sleep(DELETION_POLL_INTERVAL)
+        # Keep sweeping until nothing is due, so a backlog never outlives its deletion time
+        while True:
+            cursor.execute("SELECT rowid, chat_id, message_id FROM scheduled_deletions WHERE delete_at <= ? "
+                           "ORDER BY delete_at LIMIT 500", (time.time(),))
+            due = cursor.fetchall()
+            if not due:
+                break
+            by_chat = {}
+            for rowid, chat_id, msg_id in due:
+                by_chat.setdefault(chat_id, []).append((rowid, msg_id))
+            
+            finished = []
+            retry_later = False
+            for chat_id, rows in by_chat.items():
+                # DeleteMessages takes at most 100 IDs per call
+                for i in range(0, len(rows), 100):
+                    group = rows[i:i + 100]
+                    try:
+                        await bot.delete_messages(chat_id, [msg_id for _, msg_id in group])
+                    except FloodWait as e:
+                        # Rows stay scheduled and are picked up again after the wait
+                        log.warning("Auto-delete in chat %s rate limited for %ss", chat_id, e.value)
+                        await asyncio.sleep(e.value)
+                        continue
+                    except RPCError as e:
+                        # Telegram refused (chat gone, messages already deleted): retrying won't help
+                        log.warning("Auto-delete of %s messages in chat %s failed: %s", len(group), chat_id, e)
+                    except Exception as e:
+                        # Connection problems and the like: keep the rows for the next sweep
+                        log.warning("Auto-delete of %s messages in chat %s will be retried: %s", len(group), chat_id, e)
+                        retry_later = True
+                        continue
+                    finished.extend((rowid,) for rowid, _ in group)
+            
+            cursor.executemany("DELETE FROM scheduled_deletions WHERE rowid = ?", finished)
+            conn.commit()
+            if retry_later:
+                break  # don't spin on the kept rows; the next poll retries them
 
 # ------------------ USER INTERFACE ------------------
 
@@ -356,6 +486,8 @@ async def handle_callbacks(_, query):
             f"🚫 **Banned Users:** {banned_users}\n"
             f"💾 **Storage Used:** {format_file_size(total_size)}\n"
             f"⏱️ **Auto-Delete:** {auto_delete} min\n\n"
+            f"🧠 **Catalog Cache:**\n{catalog_cache.format_stats()}\n\n"
+            f"📡 **Storage Channels:**\n{storage.format_stats()}\n\n"
             f"🤖 **Bot Status:** Online ✅\n"
             f"📈 **Performance:** Excellent",
             reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Back", callback_data="back")]])
@@ -369,7 +501,9 @@ async def handle_callbacks(_, query):
             "2. Upload your files one by one\n"
             "3. Use `/endbatch` when done\n\n"
             "📸 **Alternative method:**\n"
-            "Use `/newbatch <start_id> <end_id>` with message IDs from DB channel\n\n"
+            "Use `/newbatch <start_id> <end_id> [channel_id]` with message IDs from the DB channel "
+            "(or the given storage channel). With several storage channels uploads are striped, "
+            "so a channel range only holds every Nth upload - prefer `/startbatch`\n\n"
             "📸 **Benefits:**\n"
             "• Single link for multiple files\n"
             "• Organized file sharing\n"
@@ -377,6 +511,15 @@ async def handle_callbacks(_, query):
             reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Back", callback_data="back")]])
         )
     
+    elif data == "user_mgmt" and is_admin(user_id):
+        text, markup = render_users_page("all", None, ">0")
+        await query.message.edit_text(text, reply_markup=markup)
+    
+    elif data.startswith("users:") and is_admin(user_id):
+        _, status, since, position = data.split(":", 3)
+        text, markup = render_users_page(status, None if since == "-" else since, position)
+        await query.message.edit_text(text, reply_markup=markup)
+    
     elif data == "back":
         if is_admin(user_id):
             await show_admin_menu(query.message)
@@ -385,7 +528,7 @@ async def handle_callbacks(_, query):
 
 # ------------------ ADMIN FILE UPLOAD ------------------
 
-@bot.on_message(filters.private & ~filters.command(["start", "newbatch", "startbatch", "endbatch", "broadcast"]) & 
+@bot.on_message(filters.private & ~filters.command(["start", "newbatch", "startbatch", "endbatch", "broadcast", "ban", "unban"]) & 
                 (filters.document | filters.video | filters.audio | filters.photo | 
                  filters.voice | filters.video_note | filters.sticker | filters.animation))
 async def handle_media_upload(_, message):
@@ -401,19 +544,29 @@ async def handle_media_upload(_, message):
     if not file_info:
         return await message.reply_text("❌ Unsupported file type.")
     
-    # Forward to database channel
+    # Batch ranges need contiguous message IDs, so uploads during a batch
+    # session stay in DB_CHANNEL instead of being striped
+    cursor.execute("SELECT 1 FROM batch_upload_sessions WHERE admin_id = ? AND status = 'waiting_end'",
+                   (message.from_user.id,))
+    pinned = DB_CHANNEL if cursor.fetchone() else None
+    
+    # Forward to storage channels
     try:
-        sent = await message.forward(DB_CHANNEL)
+        locations = await storage.store(message, pinned)
     except Exception as e:
+        log.exception("Upload of %s by %s failed", file_info['name'], message.from_user.id)
         return await message.reply_text(f"❌ Failed to save file: {str(e)}")
     
     # Save to database
-    cursor.execute("""INSERT INTO files (chat_id, message_id, file_name, file_type, file_size, uploaded_by) 
-                     VALUES (?, ?, ?, ?, ?, ?)""", 
-                  (DB_CHANNEL, sent.id, file_info['name'], file_info['type'], 
-                   file_info['size'], message.from_user.id))
-    conn.commit()
+    chat_id, msg_id = locations[0]
+    cursor.execute("""INSERT INTO files (chat_id, message_id, file_name, file_type, file_size, uploaded_by, locations) 
+                     VALUES (?, ?, ?, ?, ?, ?, ?)""", 
+                  (chat_id, msg_id, file_info['name'], file_info['type'], 
+                   file_info['size'], message.from_user.id, storage.encode_locations(locations)))
     file_id = cursor.lastrowid
+    conn.commit()
+    catalog_cache.invalidate_file(file_id, chat_id, msg_id)
+    log.info("File %s uploaded by %s", file_id, message.from_user.id)
     
     # Generate link
     token = encode_payload(f"file_{file_id}")
@@ -458,7 +611,8 @@ async def start_batch_upload(_, message):
         test_msg = await bot.send_message(DB_CHANNEL, f"📦 **Batch Start:** {batch_name}")
         start_msg_id = test_msg.id
         await test_msg.delete()
-    except:
+    except Exception:
+        log.exception("Batch session could not access DB channel %s", DB_CHANNEL)
         return await message.reply_text("❌ Failed to access database channel.")
     
     cursor.execute("""INSERT INTO batch_upload_sessions (session_id, admin_id, batch_name, start_msg_id) 
@@ -493,14 +647,17 @@ async def end_batch_upload(_, message):
         test_msg = await bot.send_message(DB_CHANNEL, f"📦 **Batch End:** {batch_name}")
         end_msg_id = test_msg.id - 1  # Previous message was the last file
         await test_msg.delete()
-    except:
+    except Exception:
+        log.exception("Batch session could not access DB channel %s", DB_CHANNEL)
         return await message.reply_text("❌ Failed to access database channel.")
     
     # Create batch
-    cursor.execute("INSERT INTO batches (batch_name, start_msg, end_msg, created_by) VALUES (?, ?, ?, ?)", 
-                   (batch_name, start_msg_id, end_msg_id, admin_id))
-    conn.commit()
+    cursor.execute("INSERT INTO batches (batch_name, start_msg, end_msg, created_by, chat_id) VALUES (?, ?, ?, ?, ?)", 
+                   (batch_name, start_msg_id, end_msg_id, admin_id, DB_CHANNEL))
     batch_id = cursor.lastrowid
+    conn.commit()
+    catalog_cache.invalidate_batch(batch_id)
+    log.info("Batch %s created by %s", batch_id, admin_id)
     
     # Clean up session
     cursor.execute("DELETE FROM batch_upload_sessions WHERE session_id = ?", (session_id,))
@@ -539,12 +696,24 @@ async def new_batch_traditional(_, message):
         if len(parts) < 3:
             return await message.reply_text(
                 "📦 **Create Batch**\n\n"
-                "**Usage:** `/newbatch <start_msg_id> <end_msg_id> [batch_name]`\n\n"
-                "**Example:** `/newbatch 100 150 My Movie Collection`"
+                "**Usage:** `/newbatch <start_msg_id> <end_msg_id> [channel_id] [batch_name]`\n\n"
+                "**Example:** `/newbatch 100 150 My Movie Collection`\n\n"
+                "Message IDs are from the DB channel unless another storage channel ID is given. "
+                "With several storage channels uploads are striped, so a range in one channel "
+                "holds only that channel's share - use `/startbatch` for new uploads."
             )
         
         start_id = int(parts[1])
         end_id = int(parts[2])
+        # An optional storage channel ID may precede the name
+        chat_id = DB_CHANNEL
+        if len(parts) > 3 and re.fullmatch(r"-100\d+", parts[3]):
+            chat_id = int(parts.pop(3))
+            if chat_id not in STORAGE_CHANNELS:
+                return await message.reply_text(
+                    f"❌ `{chat_id}` is not a storage channel. Configured: "
+                    + ", ".join(f"`{ch}`" for ch in STORAGE_CHANNELS)
+                )
         batch_name = " ".join(parts[3:]) if len(parts) > 3 else f"Batch {start_id}-{end_id}"
         
         if start_id >= end_id:
@@ -554,10 +723,12 @@ async def new_batch_traditional(_, message):
         return await message.reply_text("❌ Please provide valid message IDs (numbers only).")
     
     # Create batch
-    cursor.execute("INSERT INTO batches (batch_name, start_msg, end_msg, created_by) VALUES (?, ?, ?, ?)", 
-                   (batch_name, start_id, end_id, message.from_user.id))
-    conn.commit()
+    cursor.execute("INSERT INTO batches (batch_name, start_msg, end_msg, created_by, chat_id) VALUES (?, ?, ?, ?, ?)", 
+                   (batch_name, start_id, end_id, message.from_user.id, chat_id))
     batch_id = cursor.lastrowid
+    conn.commit()
+    catalog_cache.invalidate_batch(batch_id)
+    log.info("Batch %s created by %s", batch_id, message.from_user.id)
     
     # Generate link
     token = encode_payload(f"batch_{batch_id}")
@@ -583,18 +754,55 @@ async def new_batch_traditional(_, message):
 
 # ------------------ FILE DELIVERY ------------------
 
+def get_file_record(file_id):
+    """Catalog lookup for a file, served from the LRU cache when possible"""
+    catalog_cache.check_external_writes(conn)
+    record = catalog_cache.files.get(file_id)
+    if record is None:
+        cursor.execute("SELECT chat_id, message_id, file_name, file_type, locations FROM files WHERE id=?", (file_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        chat_id, msg_id, file_name, file_type, locations = row
+        locations = tuple(storage.decode_locations(locations, chat_id, msg_id))
+        record = catalog_cache.FileRecord(chat_id, msg_id, file_name, file_type, locations)
+        catalog_cache.files.put(file_id, record)
+    return record
+
+def get_batch_record(batch_id):
+    """Catalog lookup for a batch with its delivery plan: the replica
+    locations of every message in the range (raw channel posts only have
+    their primary copy)"""
+    catalog_cache.check_external_writes(conn)
+    record = catalog_cache.batches.get(batch_id)
+    if record is None:
+        cursor.execute("SELECT batch_name, start_msg, end_msg, chat_id FROM batches WHERE id=?", (batch_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        batch_name, start, end, batch_chat = row
+        batch_chat = batch_chat or DB_CHANNEL
+        
+        cursor.execute("SELECT message_id, locations FROM files WHERE chat_id = ? AND message_id BETWEEN ? AND ?",
+                       (batch_chat, start, end))
+        replicas = {msg_id: tuple(storage.decode_locations(locations, batch_chat, msg_id))
+                    for msg_id, locations in cursor.fetchall()}
+        plan = tuple(replicas.get(msg_id, ((batch_chat, msg_id),)) for msg_id in range(start, end + 1))
+        record = catalog_cache.BatchRecord(batch_name, start, end, batch_chat, plan)
+        catalog_cache.batches.put(batch_id, record)
+    return record
+
 async def send_file(message, file_id):
     """Send a single file to user"""
-    cursor.execute("SELECT chat_id, message_id, file_name, file_type FROM files WHERE id=?", (file_id,))
-    row = cursor.fetchone()
+    record = get_file_record(file_id)
     
-    if not row:
+    if not record:
         return await message.reply_text(
             "❌ **File Not Found**\n\n"
             "The requested file could not be found. It may have been deleted or the link is invalid."
         )
     
-    chat_id, msg_id, file_name, file_type = row
+    file_name, file_type = record.file_name, record.file_type
     
     try:
         auto_delete = get_auto_delete_time()
@@ -608,7 +816,8 @@ async def send_file(message, file_id):
         )
         
         # Copy the actual file
-        file_msg = await bot.copy_message(message.chat.id, chat_id, msg_id)
+        file_msg = await storage.copy_from_replicas(bot, message.chat.id, record.locations)
+        log.info("File %s delivered", file_id)
         
         # Send completion message
         if auto_delete > 0:
@@ -621,7 +830,7 @@ async def send_file(message, file_id):
             
             # Schedule deletion
             messages_to_delete = [info_msg.id, file_msg.id, complete_msg.id]
-            asyncio.create_task(delete_messages_after_delay(message.chat.id, messages_to_delete, auto_delete))
+            schedule_deletion(message.chat.id, messages_to_delete, auto_delete)
         else:
             await message.reply_text(
                 f"✅ **Download Complete!**\n\n"
@@ -630,6 +839,7 @@ async def send_file(message, file_id):
             )
         
     except Exception as e:
+        log.exception("Delivery of file %s to %s failed", file_id, message.chat.id)
         await message.reply_text(
             f"❌ **Download Failed**\n\n"
             f"Error: {str(e)}\n"
@@ -638,17 +848,16 @@ async def send_file(message, file_id):
 
 async def send_batch(message, batch_id):
     """Send all files in a batch to user"""
-    cursor.execute("SELECT batch_name, start_msg, end_msg FROM batches WHERE id=?", (batch_id,))
-    row = cursor.fetchone()
+    record = get_batch_record(batch_id)
     
-    if not row:
+    if not record:
         return await message.reply_text(
             "❌ **Not Found**\n\n"
             "The requested batch could not be found. It may have been deleted or the link is invalid."
         )
     
-    batch_name, start, end = row
-    file_count = end - start + 1
+    batch_name = record.batch_name
+    file_count = record.end - record.start + 1
     
     auto_delete = get_auto_delete_time()
     
@@ -663,14 +872,16 @@ async def send_batch(message, batch_id):
     failed = 0
     sent_messages = [info_msg.id]
     
-    for msg_id in range(start, end + 1):
+    for msg_id, locations in zip(range(record.start, record.end + 1), record.plan):
         try:
-            sent = await bot.copy_message(message.chat.id, DB_CHANNEL, msg_id)
+            sent = await storage.copy_from_replicas(bot, message.chat.id, locations)
             sent_messages.append(sent.id)
             successful += 1
             await asyncio.sleep(0.5)  # Small delay to avoid flooding
-        except:
+        except Exception as e:
+            log.warning("Batch %s: copy of message %s to %s failed: %s", batch_id, msg_id, message.chat.id, e)
             failed += 1
+    log.info("Batch %s delivered", batch_id)
     
     # Send completion summary
     if auto_delete > 0:
@@ -685,7 +896,7 @@ async def send_batch(message, batch_id):
         sent_messages.append(complete_msg.id)
         
         # Schedule deletion
-        asyncio.create_task(delete_messages_after_delay(message.chat.id, sent_messages, auto_delete))
+        schedule_deletion(message.chat.id, sent_messages, auto_delete)
     else:
         await message.reply_text(
             f"✅ **Download Complete!**\n\n"
@@ -711,29 +922,304 @@ async def broadcast_message(_, message):
     
     broadcast_text = " ".join(message.command[1:])
     
-    # Get all users
-    cursor.execute("SELECT user_id FROM users WHERE is_banned = 0")
-    users = cursor.fetchall()
+    # Count recipients (uses idx_users_banned, never loads the table)
+    cursor.execute("SELECT COUNT(*) FROM users WHERE is_banned = 0")
+    total_users = cursor.fetchone()[0]
     
-    if not users:
+    if not total_users:
         return await message.reply_text("❌ No users found to broadcast to.")
     
     # Confirm broadcast
     buttons = [
-        [InlineKeyboardButton("✅ Confirm Broadcast", callback_data=f"confirm_broadcast_{len(users)}")],
+        [InlineKeyboardButton("✅ Confirm Broadcast", callback_data=f"confirm_broadcast_{total_users}")],
         [InlineKeyboardButton("❌ Cancel", callback_data="cancel_broadcast")]
     ]
     
     await message.reply_text(
         f"📢 **Confirm Broadcast**\n\n"
         f"**Message:** {broadcast_text}\n"
-        f"**Recipients:** {len(users)} users\n\n"
+        f"**Recipients:** {total_users} users\n\n"
         f"Are you sure you want to send this message to all users?",
         reply_markup=InlineKeyboardMarkup(buttons)
     )
 
+# ------------------ USER MANAGEMENT ------------------
+
+USER_FILTERS = {"all": "👥 All", "banned": "🚫 Banned", "active": "✅ Active"}
+
+def fetch_users_page(status, since, position, limit=USERS_PAGE_SIZE):
+    """Keyset pagination over users.
+
+    `position` is ">ID" for the page after ID or "<ID" for the page before it.
+    Returns (rows, has_more) with rows in ascending user_id order.
+    """
+    forward = position[0] == ">"
+    anchor = int(position[1:])
+    conditions = ["user_id > ?" if forward else "user_id < ?"]
+    params = [anchor]
+    if status == "banned":
+        conditions.append("is_banned = 1")
+    elif status == "active":
+        conditions.append("is_banned = 0")
+    if since:
+        conditions.append("join_date >= ?")
+        params.append(since)
+    
+    cursor.execute(
+        f"SELECT user_id, first_name, username, join_date, is_banned FROM users "
+        f"WHERE {' AND '.join(conditions)} ORDER BY user_id {'ASC' if forward else 'DESC'} LIMIT ?",
+        params + [limit + 1]
+    )
+    rows = cursor.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not forward:
+        rows.reverse()
+    return rows, has_more
+
+def count_users(status, since):
+    query = "SELECT COUNT(*) FROM users WHERE 1 = 1"
+    params = []
+    if status == "banned":
+        query += " AND is_banned = 1"
+    elif status == "active":
+        query += " AND is_banned = 0"
+    if since:
+        query += " AND join_date >= ?"
+        params.append(since)
+    cursor.execute(query, params)
+    return cursor.fetchone()[0]
+
+def render_users_page(status, since, position):
+    """Build the text and keyboard for one page of the user browser"""
+    if status not in USER_FILTERS:
+        status = "all"
+    rows, has_more = fetch_users_page(status, since, position)
+    forward = position[0] == ">"
+    since_key = since or "-"
+    
+    lines = [
+        f"👥 **User Management** — {USER_FILTERS[status]}"
+        + (f" since {since}" if since else "")
+        + f" ({count_users(status, since)} users)\n"
+    ]
+    for user_id, first_name, username, join_date, is_banned in rows:
+        lines.append(
+            f"{'🚫' if is_banned else '•'} `{user_id}` {first_name or ''}"
+            + (f" @{username}" if username else "")
+            + f" — {str(join_date)[:10]}"
+        )
+    if not rows:
+        lines.append("No users found.")
+    lines.append(
+        "\n💡 `/users [all|banned|active] [YYYY-MM-DD]` to filter\n"
+        "🔨 `/ban` or `/unban` with user IDs, or as caption of a .txt ID list"
+    )
+    
+    # A page has a predecessor unless we walked forward from the start,
+    # and a successor unless we walked forward and hit the end
+    nav = []
+    if rows and (not forward or int(position[1:]) > 0) and (forward or has_more):
+        nav.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"users:{status}:{since_key}:<{rows[0][0]}"))
+    if rows and (has_more or not forward):
+        nav.append(InlineKeyboardButton("Next ➡️", callback_data=f"users:{status}:{since_key}:>{rows[-1][0]}"))
+    
+    buttons = [[InlineKeyboardButton(label, callback_data=f"users:{key}:{since_key}:>0")
+                for key, label in USER_FILTERS.items()]]
+    if nav:
+        buttons.append(nav)
+    buttons.append([InlineKeyboardButton("⬅️ Back", callback_data="back")])
+    return "\n".join(lines), InlineKeyboardMarkup(buttons)
+
+@bot.on_message(filters.private & filters.command("users"))
+async def list_users(_, message):
+    if not is_admin(message.from_user.id):
+        return await message.reply_text("❌ Only admins can manage users.")
+    
+    status, since = "all", None
+    for arg in message.command[1:]:
+        if arg.lower() in USER_FILTERS:
+            status = arg.lower()
+        else:
+            try:
+                since = datetime.strptime(arg, "%Y-%m-%d").strftime("%Y-%m-%d")
+            except ValueError:
+                return await message.reply_text("Usage: `/users [all|banned|active] [YYYY-MM-DD]`")
+    
+    text, markup = render_users_page(status, since, ">0")
+    await message.reply_text(text, reply_markup=markup)
+
+def iter_user_ids(lines):
+    """Yield every integer user ID found in an iterable of text lines"""
+    for line in lines:
+        for match in re.findall(r"-?\d+", line):
+            yield int(match)
+
+def _count_known(chunk):
+    """How many distinct IDs of the chunk have a users row"""
+    ids = "[" + ",".join(str(user_id) for (user_id,) in chunk) + "]"
+    cursor.execute("SELECT COUNT(*) FROM users WHERE user_id IN (SELECT value FROM json_each(?))", (ids,))
+    return cursor.fetchone()[0]
+
+def _apply_ban_chunk(chunk, banned):
+    """Returns (existing users changed, new users added) for one chunk.
+
+    Banning also inserts IDs that never started the bot, so a blocklist
+    import holds when they do; unbanning only touches existing rows.
+    """
+    if not banned:
+        cursor.executemany("UPDATE users SET is_banned = 0 WHERE user_id = ?", chunk)
+        changed = cursor.rowcount
+        conn.commit()
+        return changed, 0
+    known = _count_known(chunk)
+    cursor.executemany("INSERT INTO users (user_id, is_banned) VALUES (?, 1) "
+                       "ON CONFLICT(user_id) DO UPDATE SET is_banned = 1", chunk)
+    added = _count_known(chunk) - known
+    conn.commit()
+    return known, added
+
+async def set_ban_status(user_ids, banned):
+    """Apply ban status with executemany in chunked transactions.
+
+    Returns (ids processed, existing users changed, new users added). Yields
+    to the event loop between chunks so long lists do not stall other handlers.
+    """
+    processed = changed = added = 0
+    chunk = []
+    for user_id in user_ids:
+        chunk.append((user_id,))
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            chunk_changed, chunk_added = _apply_ban_chunk(chunk, banned)
+            processed += len(chunk)
+            changed += chunk_changed
+            added += chunk_added
+            chunk = []
+            await asyncio.sleep(0)
+    if chunk:
+        chunk_changed, chunk_added = _apply_ban_chunk(chunk, banned)
+        processed += len(chunk)
+        changed += chunk_changed
+        added += chunk_added
+    return processed, changed, added
+
+@bot.on_message(filters.private & filters.command(["ban", "unban"]))
+async def bulk_ban(_, message):
+    if not is_admin(message.from_user.id):
+        return await message.reply_text("❌ Only admins can manage users.")
+    
+    banned = message.command[0].lower() == "ban"
+    action = "Ban" if banned else "Unban"
+    
+    # IDs come from an attached (or replied-to) text file, or the command itself
+    document = message.document or (message.reply_to_message.document if message.reply_to_message else None)
+    if document:
+        is_text = document.mime_type == "text/plain" or (document.file_name or "").lower().endswith(".txt")
+        if not is_text:
+            return await message.reply_text("❌ The ID list must be a plain text (.txt) file.")
+        if document.file_size and document.file_size > MAX_ID_LIST_SIZE:
+            return await message.reply_text(f"❌ ID list is too large (max {format_file_size(MAX_ID_LIST_SIZE)}).")
+        source = message if message.document else message.reply_to_message
+        data = await source.download(in_memory=True)
+        data.seek(0)
+        user_ids = iter_user_ids(io.TextIOWrapper(data, encoding="utf-8", errors="ignore"))
+    elif len(message.command) > 1:
+        user_ids = iter_user_ids(message.command[1:])
+    else:
+        return await message.reply_text(
+            f"🔨 **Bulk {action}**\n\n"
+            f"**Usage:** `/{action.lower()} <user_id> [user_id ...]`\n"
+            f"Or send a .txt file of user IDs with `/{action.lower()}` as caption."
+        )
+    
+    processed, changed, added = await set_ban_status(user_ids, banned)
+    log.info("%s of %s users (%s existing, %s new) by %s", action, processed, changed, added, message.from_user.id)
+    if banned:
+        details = (
+            f"👤 **Existing users banned:** {changed}\n"
+            f"🆕 **New IDs blocked before first use:** {added}"
+        )
+    else:
+        details = (
+            f"👤 **Users unbanned:** {changed}\n"
+            f"❓ **Not found:** {processed - changed}"
+        )
+    await message.reply_text(
+        f"✅ **Bulk {action} Complete**\n\n"
+        f"🆔 **IDs processed:** {processed}\n"
+        + details
+    )
+
+# ------------------ DATABASE MAINTENANCE ------------------
+
+@bot.on_message(filters.private & filters.command("dbstatus"))
+async def db_status(_, message):
+    if not is_admin(message.from_user.id):
+        return await message.reply_text("❌ Only admins can view database status.")
+    
+    # `/dbstatus <task>` runs a task right away
+    if len(message.command) > 1:
+        task = message.command[1].lower()
+        if task not in db_maintenance.TASKS:
+            return await message.reply_text(
+                f"❌ Unknown task. Available: {', '.join(db_maintenance.TASKS)}"
+            )
+        # Maintenance is a singleton duty in multi-core mode: hand the run to the leader
+        if not db_maintenance.leader:
+            db_maintenance.request_task(task, message.chat.id)
+            return await message.reply_text(f"⏳ **{task}** queued for the maintenance leader; the status follows when it's done.")
+        await message.reply_text(f"⏳ Running **{task}**...")
+        await db_maintenance.run_task(task)
+    
+    await message.reply_text(db_maintenance.format_status())
+
+# ------------------ PROFILING ------------------
+
+@bot.on_message(filters.private & filters.command("profile"))
+async def profile_command(_, message):
+    if not is_admin(message.from_user.id):
+        return await message.reply_text("❌ Only admins can profile the bot.")
+    
+    try:
+        seconds = int(message.command[1]) if len(message.command) > 1 else 30
+        if not 1 <= seconds <= PROFILE_MAX_SECONDS:
+            raise ValueError
+    except ValueError:
+        return await message.reply_text(f"Usage: `/profile <seconds>` (1-{PROFILE_MAX_SECONDS})")
+    
+    if profiler.active:
+        return await message.reply_text("⏳ A profile is already running.")
+    
+    progress = await message.reply_text(f"🔬 **Profiling for {seconds}s...**")
+    try:
+        collapsed, summary = await profiler.profile(seconds)
+    except RuntimeError:
+        # Another /profile claimed the profiler while the notice was being sent
+        return await progress.edit_text("⏳ A profile is already running.")
+    
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    await bot.send_document(
+        message.chat.id, io.BytesIO(collapsed.encode()), file_name=f"profile-{stamp}.folded",
+        caption="🔥 Collapsed stacks (flamegraph.pl / speedscope)"
+    )
+    await bot.send_document(
+        message.chat.id, io.BytesIO(summary.encode()), file_name=f"profile-{stamp}-summary.txt",
+        caption="📊 Hotspot summary"
+    )
+
+async def main():
+    listener = bot_logging.setup_logging()
+    await bot.start()
+    log.info("Bot is now running and ready to serve (auto-delete: %s minutes)", get_auto_delete_time())
+    background = [asyncio.create_task(db_maintenance.maintenance_loop())]
+    if LOG_CHANNEL:
+        background.append(asyncio.create_task(bot_logging.digest_loop(bot)))
+    await idle()
+    for task in background:
+        task.cancel()
+    await bot.stop()
+    listener.stop()
+
 # Start the bot
 if __name__ == "__main__":
-    print("✅ Bot is now running and ready to serve!")
-    print(f"⏱️ Auto-delete time: {get_auto_delete_time()} minutes")
-    bot.run()
\ No newline at end of file
+    bot.run(main())
\ No newline at end of file
@@ -0,0 +1,163 @@
+"""Multi-core mode - shard update handling across worker processes.
+
+Usage:
+    python multicore.py [--workers N]
+
+The front process is the only Telegram client receiving updates. It routes
+every Message/CallbackQuery by user_id to one of N worker processes, so all
+updates from one user are handled in order by the same worker. Each worker
+imports main.py with its own client (no_updates), event loop and SQLite
+connection (WAL). The worker holding the LEADER_LOCK_FILE flock runs the
+singleton duties: database maintenance and scheduled auto-deletions.
+Workers log into a shared queue; the front process owns the log file,
+console and LOG_CHANNEL digests. Requires fcntl (Linux/macOS).
+"""
+import argparse, asyncio, fcntl, logging, multiprocessing, os, pickle
+from pyrogram import Client, idle, StopPropagation, ContinuePropagation
+from pyrogram.handlers import MessageHandler, CallbackQueryHandler
+from pyrogram.types import CallbackQuery
+from config import API_ID, API_HASH, BOT_TOKEN, WORKERS, LEADER_LOCK_FILE, LEADER_RETRY_INTERVAL, LOG_CHANNEL
+import bot_logging
+
+log = logging.getLogger("filestore.multicore")
+
+def worker_for(user_id, workers):
+    """Worker index for a user; updates without a user go to worker 0"""
+    return user_id % workers if user_id else 0
+
+# ------------------ WORKER PROCESS ------------------
+
+async def dispatch(bot, update):
+    """Run the first matching handler of each group, like pyrogram's dispatcher"""
+    handler_type = CallbackQueryHandler if isinstance(update, CallbackQuery) else MessageHandler
+    for group in bot.dispatcher.groups.values():
+        for handler in group:
+            if not isinstance(handler, handler_type):
+                continue
+            try:
+                if await handler.check(bot, update):
+                    await handler.callback(bot, update)
+                    break
+            except StopPropagation:
+                return
+            except ContinuePropagation:
+                continue
+            except Exception:
+                log.exception("Handler %s failed", handler.callback.__name__)
+                break
+
+async def lead(main, worker_id):
+    """Wait for the leader lock, then run the singleton duties until shutdown"""
+    import db_maintenance
+    lock = open(LEADER_LOCK_FILE, "a")
+    try:
+        while True:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                await asyncio.sleep(LEADER_RETRY_INTERVAL)
+        db_maintenance.leader = True
+        log.info("Worker %s is the leader", worker_id)
+        await asyncio.gather(
+            db_maintenance.maintenance_loop(), db_maintenance.request_loop(main.bot), main.deletion_loop()
+        )
+    finally:
+        db_maintenance.leader = False
+        lock.close()  # releases the flock for the next leader
+
+async def serve_worker(main, worker_id, updates):
+    bot = main.bot
+    await bot.start()
+    leader = asyncio.create_task(lead(main, worker_id))
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(bot.workers)
+    running = set()
+    log.info("Worker %s ready", worker_id)
+
+    while True:
+        data = await loop.run_in_executor(None, updates.get)
+        if data is None:
+            break
+        update = pickle.loads(data)
+        update.bind(bot)
+        await slots.acquire()
+        task = asyncio.create_task(dispatch(bot, update))
+        running.add(task)
+        task.add_done_callback(lambda t: (running.discard(t), slots.release()))
+
+    await asyncio.gather(*running, return_exceptions=True)
+    leader.cancel()
+    await asyncio.gather(leader, return_exceptions=True)
+    await bot.stop()
+
+def worker_main(worker_id, updates, log_records):
+    # main.py reads this at import to build a no_updates client with its own session
+    os.environ["FILESTORE_WORKER"] = str(worker_id)
+    bot_logging.setup_worker_logging(log_records)
+    import main, db_maintenance
+    db_maintenance.leader = False
+    main.bot.run(serve_worker(main, worker_id, updates))
+
+# ------------------ FRONT PROCESS ------------------
+
+def start_worker(ctx, worker_id, updates, log_records):
+    process = ctx.Process(target=worker_main, args=(worker_id, updates, log_records), name=f"worker-{worker_id}")
+    process.start()
+    return process
+
+async def watch_workers(ctx, processes, queues, log_records):
+    """Restart any worker that died; its queue (and pending updates) is kept"""
+    while True:
+        await asyncio.sleep(5)
+        for i, process in enumerate(processes):
+            if not process.is_alive():
+                log.error("Worker %s exited with code %s, restarting", i, process.exitcode)
+                processes[i] = start_worker(ctx, i, queues[i], log_records)
+
+async def serve_front(front, ctx, processes, queues, log_records):
+    await front.start()
+    log.info("Front process routing updates to %s workers", len(queues))
+    background = [asyncio.create_task(watch_workers(ctx, processes, queues, log_records))]
+    if LOG_CHANNEL:
+        background.append(asyncio.create_task(bot_logging.digest_loop(front)))
+    await idle()
+    for task in background:
+        task.cancel()
+    await front.stop()
+
+def run(workers):
+    ctx = multiprocessing.get_context("spawn")
+    log_records = ctx.Queue()
+    listener = bot_logging.setup_logging(records=log_records)
+    # One-time schema migration, before any worker opens the database
+    import db_maintenance
+    db_maintenance.migrate_auto_vacuum()
+    queues = [ctx.Queue() for _ in range(workers)]
+    processes = [start_worker(ctx, i, queues[i], log_records) for i in range(workers)]
+
+    front = Client("FileStoreBot", api_id=API_ID, api_hash=API_HASH, bot_token=BOT_TOKEN)
+
+    async def route(_, update):
+        user = update.from_user
+        try:
+            data = pickle.dumps(update)
+        except Exception:
+            return log.exception("Could not serialize update from %s", user.id if user else None)
+        queues[worker_for(user.id if user else None, workers)].put(data)
+
+    front.add_handler(MessageHandler(route))
+    front.add_handler(CallbackQueryHandler(route))
+    try:
+        front.run(serve_front(front, ctx, processes, queues, log_records))
+    finally:
+        for updates in queues:
+            updates.put(None)
+        for process in processes:
+            process.join(timeout=30)
+        listener.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the bot with updates sharded across worker processes")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    run(parser.parse_args().workers)
@@ -0,0 +1,112 @@
+import asyncio, os, sys, threading, time
+from collections import Counter
+from config import PROFILE_SAMPLE_INTERVAL, PROFILE_TASK_INTERVAL, PROFILE_TOP_N
+
+# Nothing is installed while this is False: no hooks, threads or tasks
+active = False
+
+def _label(code, lineno):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{lineno})"
+
+def _frame_stack(frame):
+    """Root-first list of frame labels"""
+    stack = []
+    while frame is not None:
+        stack.append(_label(frame.f_code, frame.f_code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+def _await_chain(task):
+    """Where a task is suspended, following cr_await from the task's coroutine down"""
+    stack = []
+    coro = task.get_coro()
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is not None:
+            stack.append(_label(frame.f_code, frame.f_lineno))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return stack
+
+def _sample_threads(stop, interval, samples):
+    """Runs in its own thread: snapshot every other thread's stack each interval"""
+    me = threading.get_ident()
+    while not stop.wait(interval):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident != me:
+                samples[";".join([f"thread:{names.get(ident, ident)}"] + _frame_stack(frame))] += 1
+
+async def _sample_tasks(deadline, interval, samples, lag, task_counts):
+    """Runs on the event loop: measure loop lag and record where every task is waiting"""
+    me = asyncio.current_task()
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag.append(time.perf_counter() - started - interval)
+        tasks = [t for t in asyncio.all_tasks() if t is not me and not t.done()]
+        task_counts.append(len(tasks))
+        for task in tasks:
+            samples[";".join(["task"] + _await_chain(task))] += 1
+
+def _top(counter, n):
+    return "\n".join(f"{count:>8}  {name}" for name, count in counter.most_common(n)) or "        (none)"
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def summarize(seconds, thread_samples, task_samples, lag, task_counts, top=PROFILE_TOP_N):
+    """Top-N hotspot report"""
+    self_time, inclusive = Counter(), Counter()
+    for stack, count in thread_samples.items():
+        frames = stack.split(";")
+        self_time[frames[-1]] += count
+        for frame in set(frames[1:]):
+            inclusive[frame] += count
+    waiting = Counter()
+    for stack, count in task_samples.items():
+        waiting[" → ".join(stack.split(";")[1:])] += count
+
+    return (
+        f"Profile: {seconds}s, {sum(thread_samples.values())} thread samples "
+        f"every {PROFILE_SAMPLE_INTERVAL * 1000:.0f} ms\n"
+        f"Event-loop lag: p50 {_percentile(lag, 50) * 1000:.1f} ms, "
+        f"p99 {_percentile(lag, 99) * 1000:.1f} ms, max {max(lag, default=0) * 1000:.1f} ms\n"
+        f"Tasks: avg {sum(task_counts) / max(len(task_counts), 1):.1f}, max {max(task_counts, default=0)}\n\n"
+        f"Top {top} by self samples:\n{_top(self_time, top)}\n\n"
+        f"Top {top} by inclusive samples:\n{_top(inclusive, top)}\n\n"
+        f"Top {top} task await points:\n{_top(waiting, top)}\n"
+    )
+
+async def profile(seconds):
+    """Sample threads and asyncio tasks for `seconds`.
+
+    Returns (collapsed stacks, summary). The collapsed text is one
+    "frame;frame;frame count" line per stack, ready for flamegraph.pl or speedscope.
+    """
+    global active
+    if active:
+        raise RuntimeError("A profile is already running")
+    active = True
+    thread_samples, task_samples = Counter(), Counter()
+    lag, task_counts = [], []
+    stop = threading.Event()
+    sampler = threading.Thread(
+        target=_sample_threads, args=(stop, PROFILE_SAMPLE_INTERVAL, thread_samples),
+        name="profiler", daemon=True
+    )
+    try:
+        sampler.start()
+        await _sample_tasks(time.monotonic() + seconds, PROFILE_TASK_INTERVAL, task_samples, lag, task_counts)
+    finally:
+        stop.set()
+        await asyncio.to_thread(sampler.join)
+        active = False
+
+    collapsed = "\n".join(
+        f"{stack} {count}" for stack, count in (thread_samples + task_samples).most_common()
+    )
+    return collapsed, summarize(seconds, thread_samples, task_samples, lag, task_counts)
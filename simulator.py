@@ -0,0 +1,358 @@
+"""Load simulator - replays update streams against the bot handlers with a fake Telegram client.
+
+Usage:
+    python simulator.py --rate 50 --duration 60
+    python simulator.py --rate 200 --duration 30 --record stream.jsonl
+    python simulator.py --replay stream.jsonl --latency 0.08 --channel-rate 20
+
+The bot runs against a temporary copy of the schema (never files.db) and a
+FakeClient that answers every API call after a configurable latency and
+raises FloodWait when a chat or storage channel exceeds its rate limit.
+The temporary directory (database, JSON log) is removed afterwards unless
+--keep is given.
+"""
+import argparse, asyncio, json, math, os, random, resource, shutil, sys, tempfile, time, tracemalloc
+from types import SimpleNamespace
+import config
+
+# Scenario mix: kind -> weight
+DEFAULT_MIX = {"deeplink": 70, "batch": 5, "upload": 5, "broadcast": 1, "callback": 19}
+
+# ------------------ FAKE TELEGRAM CLIENT ------------------
+
+class RateLimiter:
+    """Token bucket per chat; returns the FloodWait seconds when a call is over the limit"""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}  # chat_id -> (tokens, last refill time)
+
+    def take(self, chat_id):
+        if not self.rate:
+            return 0
+        now = time.monotonic()
+        tokens, last = self.buckets.get(chat_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self.buckets[chat_id] = (tokens, now)
+            return math.ceil((1 - tokens) / self.rate)
+        self.buckets[chat_id] = (tokens - 1, now)
+        return 0
+
+class FakeClient:
+    """Stands in for pyrogram.Client: configurable latency and per-chat FloodWait behaviour"""
+    def __init__(self, latency=0.05, jitter=0.5, chat_rate=0, channel_rate=0, channels=()):
+        from pyrogram.errors import FloodWait
+        self.FloodWait = FloodWait
+        self.latency = latency
+        self.jitter = jitter
+        self.channels = set(channels)
+        self.chat_limits = RateLimiter(chat_rate, max(1, chat_rate * 3))
+        self.channel_limits = RateLimiter(channel_rate, max(1, channel_rate * 2))
+        self.next_id = {}
+        self.calls = 0
+        self.flood_waits = 0
+        self.me = SimpleNamespace(id=1, username="SimulatedFileStoreBot", first_name="Bot")
+
+    async def _call(self, chat_id, *channels):
+        self.calls += 1
+        for channel in channels:
+            wait = self.channel_limits.take(channel)
+            if wait:
+                self.flood_waits += 1
+                raise self.FloodWait(value=wait)
+        if chat_id not in self.channels:
+            wait = self.chat_limits.take(chat_id)
+            if wait:
+                self.flood_waits += 1
+                raise self.FloodWait(value=wait)
+        if self.latency:
+            await asyncio.sleep(random.uniform(1 - self.jitter, 1 + self.jitter) * self.latency)
+
+    def _new_message(self, chat_id, text=None):
+        self.next_id[chat_id] = self.next_id.get(chat_id, 0) + 1
+        return FakeMessage(self, chat_id, self.next_id[chat_id], text=text, from_user=self.me)
+
+    async def get_me(self):
+        await self._call(None)
+        return self.me
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self._call(chat_id)
+        return self._new_message(chat_id, text)
+
+    async def copy_message(self, chat_id, from_chat_id, message_id, **kwargs):
+        await self._call(chat_id, from_chat_id)
+        return self._new_message(chat_id)
+
+    async def forward_messages(self, chat_id, from_chat_id, message_ids, **kwargs):
+        await self._call(chat_id, chat_id)
+        return self._new_message(chat_id)
+
+    async def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        await self._call(chat_id)
+
+    async def delete_messages(self, chat_id, message_ids, **kwargs):
+        await self._call(chat_id)
+
+    async def answer_callback_query(self, callback_query_id, text=None, show_alert=False):
+        await self._call(None)
+
+class FakeMessage:
+    """The subset of pyrogram.types.Message the handlers use"""
+    MEDIA = ("document", "photo", "video", "audio", "voice", "video_note", "sticker", "animation")
+
+    def __init__(self, client, chat_id, message_id, text=None, from_user=None, media=None):
+        self._client = client
+        self.id = message_id
+        self.chat = SimpleNamespace(id=chat_id)
+        self.from_user = from_user
+        self.text = text
+        self.caption = None
+        self.command = text[1:].split() if text and text.startswith("/") else None
+        for kind in self.MEDIA:
+            setattr(self, kind, None)
+        if media:
+            setattr(self, media[0], media[1])
+
+    async def reply_text(self, text, **kwargs):
+        return await self._client.send_message(self.chat.id, text, **kwargs)
+
+    async def edit_text(self, text, **kwargs):
+        return await self._client.edit_message_text(self.chat.id, self.id, text, **kwargs)
+
+    async def forward(self, chat_id):
+        return await self._client.forward_messages(chat_id, self.chat.id, self.id)
+
+    async def delete(self):
+        return await self._client.delete_messages(self.chat.id, self.id)
+
+class FakeCallbackQuery:
+    def __init__(self, client, user, data):
+        self._client = client
+        self.id = str(random.getrandbits(32))
+        self.from_user = user
+        self.data = data
+        self.message = FakeMessage(client, user.id, 1, from_user=client.me)
+
+    async def answer(self, text=None, show_alert=False):
+        return await self._client.answer_callback_query(self.id, text, show_alert)
+
+# ------------------ SCENARIOS ------------------
+
+def synthetic_stream(rate, duration, mix, users, files, batches):
+    """Poisson arrivals with a Zipf-like skew on which links get clicked"""
+    kinds, weights = zip(*mix.items())
+    t = 0.0
+    while True:
+        t += random.expovariate(rate)
+        if t >= duration:
+            return
+        kind = random.choices(kinds, weights)[0]
+        event = {"t": round(t, 4), "kind": kind, "user": random.randint(1, users)}
+        if kind == "deeplink":
+            event["target"] = min(files, int(random.paretovariate(1.1)))
+        elif kind == "batch":
+            event["target"] = min(batches, int(random.paretovariate(1.1)))
+        elif kind == "callback":
+            event["data"] = random.choice(["help", "about", "contact", "back"])
+        yield event
+
+def replay_stream(path):
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def sandbox_config(db_file, channels):
+    """Point the bot at a throwaway database and fake storage channels; call before importing main"""
+    config.DB_FILE = db_file
+    config.DB_BACKUP_DIR = os.path.join(os.path.dirname(db_file), "backups")
+    config.STORAGE_CHANNELS = channels
+    config.STORAGE_REPLICAS = min(2, len(channels))
+    config.DB_CHANNEL = channels[0]
+
+def seed_database(main, files, batches, batch_size, channels):
+    """Fill the temporary catalog so deep links resolve"""
+    rows = []
+    for i in range(1, files + 1):
+        chat_id = channels[i % len(channels)]
+        replica = channels[(i + 1) % len(channels)]
+        locations = main.storage.encode_locations([(chat_id, i), (replica, i)] if replica != chat_id else [(chat_id, i)])
+        rows.append((chat_id, i, f"file_{i}.bin", "Document", 1024 * i, 0, locations))
+    main.cursor.executemany(
+        "INSERT INTO files (chat_id, message_id, file_name, file_type, file_size, uploaded_by, locations) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        rows
+    )
+    main.cursor.executemany(
+        "INSERT INTO batches (batch_name, start_msg, end_msg, created_by, chat_id) VALUES (?, ?, ?, ?, ?)",
+        [(f"batch_{i}", i, i + batch_size - 1, 0, channels[i % len(channels)]) for i in range(1, batches + 1)]
+    )
+    main.conn.commit()
+
+def build_update(main, client, event):
+    """Turn a stream event into (handler, update)"""
+    kind = event["kind"]
+    admin = main.ADMINS[0]
+    user_id = admin if kind in ("upload", "broadcast") else event["user"]
+    user = SimpleNamespace(id=user_id, first_name=f"User{user_id}", username=f"user{user_id}")
+
+    if kind == "deeplink":
+        payload = main.encode_payload(f"file_{event['target']}")
+        return main.start_command, FakeMessage(client, user_id, 0, f"/start {payload}", user)
+    if kind == "batch":
+        payload = main.encode_payload(f"batch_{event['target']}")
+        return main.start_command, FakeMessage(client, user_id, 0, f"/start {payload}", user)
+    if kind == "upload":
+        document = SimpleNamespace(file_name=f"upload_{event['t']}.bin", file_id="BQAD" + os.urandom(8).hex(), file_size=4096)
+        return main.handle_media_upload, FakeMessage(client, user_id, 0, None, user, media=("document", document))
+    if kind == "broadcast":
+        return main.broadcast_message, FakeMessage(client, user_id, 0, "/broadcast Simulated announcement", user)
+    if kind == "callback":
+        return main.handle_callbacks, FakeCallbackQuery(client, user, event.get("data", "help"))
+    raise ValueError(f"Unknown event kind: {kind}")
+
+# ------------------ METRICS ------------------
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def rss_mb():
+    """Current resident set size, falling back to the peak where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+async def monitor_loop_lag(samples, interval=0.05):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - started - interval)
+
+async def run(args, main, client):
+    mix = dict(DEFAULT_MIX)
+    for item in args.mix or []:
+        kind, weight = item.split("=")
+        mix[kind] = float(weight)
+
+    if args.replay:
+        events = list(replay_stream(args.replay))
+    else:
+        events = list(synthetic_stream(args.rate, args.duration, mix, args.users, args.files, args.batches))
+    if args.record:
+        with open(args.record, "w") as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+
+    queue = asyncio.Queue()
+    latencies = {}
+    errors = {}
+    lag = []
+
+    async def worker():
+        while True:
+            arrived, event, handler, update = await queue.get()
+            try:
+                await handler(client, update)
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            latencies.setdefault(event["kind"], []).append(time.perf_counter() - arrived)
+            queue.task_done()
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    rss_start = rss_mb()
+    background = set(asyncio.all_tasks())
+    workers = [asyncio.create_task(worker()) for _ in range(args.workers)]
+    lag_task = asyncio.create_task(monitor_loop_lag(lag))
+
+    started = time.perf_counter()
+    for event in events:
+        delay = started + event["t"] - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        handler, update = build_update(main, client, event)
+        queue.put_nowait((time.perf_counter(), event, handler, update))
+    await queue.join()
+    elapsed = time.perf_counter() - started
+
+    rss_end = rss_mb()
+    traced = tracemalloc.get_traced_memory() if args.tracemalloc else None
+    # Whatever is still pending now are scheduled deletions
+    pending = [t for t in asyncio.all_tasks() if t not in background and t not in workers
+               and t is not lag_task and t is not asyncio.current_task()]
+    for task in workers + pending + [lag_task]:
+        task.cancel()
+    await asyncio.gather(*workers, *pending, lag_task, return_exceptions=True)
+
+    done = sum(len(v) for v in latencies.values())
+    print(f"\n📊 Simulation: {len(events)} updates in {elapsed:.1f}s, {args.workers} workers")
+    offered = len(events) / max(events[-1]["t"] if events else 0, 1e-9)
+    print(f"Throughput: {done / elapsed:.1f} updates/s (offered {offered:.1f}/s)")
+    print(f"{'kind':<10} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for kind, values in sorted(latencies.items()) + [("all", [v for vs in latencies.values() for v in vs])]:
+        print(f"{kind:<10} {len(values):>7} " + " ".join(
+            f"{percentile(values, p) * 1000:>9.1f}" for p in (50, 95, 99, 100)))
+    print(f"Event-loop lag: p99 {percentile(lag, 99) * 1000:.1f} ms, max {max(lag, default=0) * 1000:.1f} ms")
+    print(f"Memory: RSS {rss_start:.1f} -> {rss_end:.1f} MB ({rss_end - rss_start:+.1f} MB)")
+    if traced:
+        print(f"Python heap: {traced[0] / 1024 / 1024:.1f} MB current, {traced[1] / 1024 / 1024:.1f} MB peak")
+    print(f"API calls: {client.calls}, FloodWaits: {client.flood_waits}, pending deletions: {len(pending)}")
+    print(f"Catalog cache:\n{main.catalog_cache.format_stats()}")
+    if errors:
+        print(f"Handler errors: {errors}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay update streams against the bot with a fake Telegram client")
+    parser.add_argument("--rate", type=float, default=50, help="Updates per second (synthetic streams)")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of traffic to generate")
+    parser.add_argument("--mix", nargs="*", metavar="KIND=WEIGHT", help=f"Override scenario weights {DEFAULT_MIX}")
+    parser.add_argument("--replay", help="JSONL stream to replay instead of generating one")
+    parser.add_argument("--record", help="Write the stream that was played to this JSONL file")
+    parser.add_argument("--workers", type=int, default=min(32, (os.cpu_count() or 0) + 4), help="Concurrent handlers (pyrogram default)")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--batches", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--channels", type=int, default=2, help="Number of fake storage channels")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean API latency in seconds")
+    parser.add_argument("--chat-rate", type=float, default=20, help="Messages/s allowed per user chat (0 = unlimited)")
+    parser.add_argument("--channel-rate", type=float, default=0, help="Copies/s allowed per storage channel (0 = unlimited)")
+    parser.add_argument("--auto-delete", type=int, default=10, help="Auto-delete minutes (0 disables)")
+    parser.add_argument("--tracemalloc", action="store_true", help="Also trace Python heap (slower)")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary database and log, and print their directory")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    random.seed(args.seed)
+
+    workdir = tempfile.mkdtemp(prefix="filestore-sim-")
+    channels = [-1000000000000 - i for i in range(1, args.channels + 1)]
+    sandbox_config(os.path.join(workdir, "files.db"), channels)
+
+    import main, bot_logging
+    # Same queue-based pipeline as production, writing JSON logs into the work dir
+    listener = bot_logging.setup_logging(os.path.join(workdir, "bot.log"), console=False)
+    client = FakeClient(args.latency, chat_rate=args.chat_rate, channel_rate=args.channel_rate, channels=channels)
+    main.bot = client
+    main.set_auto_delete_time(args.auto_delete)
+    seed_database(main, args.files, args.batches, args.batch_size, channels)
+
+    try:
+        # Handlers were registered on the real client's loop at import time
+        asyncio.get_event_loop().run_until_complete(run(args, main, client))
+    finally:
+        listener.stop()
+        main.conn.close()
+        if args.keep:
+            print(f"Database and log kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,104 @@
+import asyncio, itertools, logging, time
+from pyrogram.errors import FloodWait
+from config import STORAGE_CHANNELS, STORAGE_REPLICAS
+
+log = logging.getLogger("filestore.storage")
+
+# Longest FloodWait we sit out when every replica is rate limited
+MAX_FLOOD_WAIT = 30
+
+_stripe = itertools.count()
+inflight = {}        # channel -> copies currently being served from it
+cooldown_until = {}  # channel -> monotonic time its FloodWait ends
+
+def encode_locations(locations):
+    """[(chat_id, message_id), ...] -> "chat:msg,chat:msg" for the files table"""
+    return ",".join(f"{chat_id}:{message_id}" for chat_id, message_id in locations)
+
+def decode_locations(text, chat_id, message_id):
+    """Parse a locations column, falling back to the primary location for old rows"""
+    if not text:
+        return [(chat_id, message_id)]
+    return [tuple(int(x) for x in part.split(":")) for part in text.split(",")]
+
+def _channel_order(pinned=None):
+    """Storage channels in the order uploads should try them"""
+    start = next(_stripe) % len(STORAGE_CHANNELS)
+    ring = STORAGE_CHANNELS[start:] + STORAGE_CHANNELS[:start]
+    if pinned is not None:
+        ring = [pinned] + [ch for ch in ring if ch != pinned]
+    return ring
+
+def _cooling(channel):
+    return cooldown_until.get(channel, 0) > time.monotonic()
+
+async def store(message, pinned=None):
+    """Forward an upload to the next stripe channel plus replicas.
+
+    Returns the list of (chat_id, message_id) locations, primary first.
+    When `pinned` is given (batch sessions need contiguous ids) the primary
+    copy must land there; otherwise a failing channel is skipped.
+    """
+    ring = _channel_order(pinned)
+    wanted = min(STORAGE_REPLICAS, len(ring))
+    locations = []
+    last_error = None
+    for channel in ring:
+        if len(locations) == wanted:
+            break
+        try:
+            sent = await message.forward(channel)
+            locations.append((channel, sent.id))
+        except Exception as e:
+            if isinstance(e, FloodWait):
+                cooldown_until[channel] = time.monotonic() + e.value
+            if channel == pinned:
+                raise
+            last_error = e
+    if not locations:
+        raise last_error
+    return locations
+
+def rank(locations):
+    """Replicas ordered by health then load; ties keep the primary first"""
+    return sorted(locations, key=lambda loc: (_cooling(loc[0]), inflight.get(loc[0], 0)))
+
+async def copy_from_replicas(client, chat_id, locations):
+    """Copy a stored message to `chat_id` from the least-loaded replica, failing over on errors"""
+    for attempt in range(2):
+        last_error = None
+        flood_waits = []
+        for src_chat, src_msg in rank(locations):
+            inflight[src_chat] = inflight.get(src_chat, 0) + 1
+            try:
+                return await client.copy_message(chat_id, src_chat, src_msg)
+            except FloodWait as e:
+                log.warning("Storage channel %s is rate limited for %ss, failing over", src_chat, e.value)
+                cooldown_until[src_chat] = time.monotonic() + e.value
+                flood_waits.append(e.value)
+                last_error = e
+            except Exception as e:
+                log.warning("Copy from storage channel %s failed, failing over: %s", src_chat, e)
+                last_error = e
+            finally:
+                inflight[src_chat] -= 1
+        # Every replica is rate limited: sit out the shortest wait once, then retry
+        if attempt or len(flood_waits) < len(locations) or min(flood_waits) > MAX_FLOOD_WAIT:
+            break
+        await asyncio.sleep(min(flood_waits))
+    raise last_error
+
+def channel_stats():
+    """Current load and cooldown per storage channel"""
+    now = time.monotonic()
+    return {
+        ch: (inflight.get(ch, 0), max(0, cooldown_until.get(ch, 0) - now))
+        for ch in STORAGE_CHANNELS
+    }
+
+def format_stats():
+    lines = []
+    for ch, (load, cooldown) in channel_stats().items():
+        status = f"cooling down {cooldown:.0f}s" if cooldown else "ready"
+        lines.append(f"• `{ch}`: {load} copies in flight, {status}")
+    return "\n".join(lines)